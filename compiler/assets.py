@@ -1,40 +1,112 @@
 """
 Shared asset loader for the CTF compiler.
 
-Reads ``shared.css`` and ``shared.js`` once and caches them so both
-the homepage generator and the challenge-page directive can inline
-them into their templates via ``{{SHARED_CSS}}`` and ``{{SHARED_JS}}``
-placeholders.
+Reads ``shared.css`` and ``shared.js`` once at import time so both the
+homepage generator and the challenge-page directive can inline them into
+their templates via ``{{SHARED_CSS}}`` and ``{{SHARED_JS}}`` placeholders.
+
+Also provides the ``{{NAME}}`` substitution both templates use for their
+page-specific values: :func:`compile_template` splits a template once and
+:func:`render_template` fills it, so cached templates are never rescanned.
+:func:`compile_template_bytes` / :func:`render_template_bytes` do the same
+for pages written straight to disk, with the static text (shared CSS/JS
+included) encoded once up front.
 """
 
 from __future__ import annotations
 
+import re
 from pathlib import Path
 
 _DIR = Path(__file__).parent
 
-_css_cache: str | None = None
-_js_cache: str | None = None
+_CSS = (_DIR / "shared.css").read_text(encoding="utf-8")
+_JS = (_DIR / "shared.js").read_text(encoding="utf-8")
+
+# Both placeholders are substituted in a single scan of the template.
+_SHARED_RE = re.compile(r"\{\{SHARED_(CSS|JS)\}\}")
+_SHARED_TABLE = {"CSS": _CSS, "JS": _JS}
+
+# UTF-8 encoded once, for templates compiled by compile_template_bytes.
+_CSS_BYTES = _CSS.encode("utf-8")
+_JS_BYTES = _JS.encode("utf-8")
 
 
 def shared_css() -> str:
     """Return the contents of ``shared.css``."""
-    global _css_cache
-    if _css_cache is None:
-        _css_cache = (_DIR / "shared.css").read_text(encoding="utf-8")
-    return _css_cache
+    return _CSS
 
 
 def shared_js() -> str:
     """Return the contents of ``shared.js``."""
-    global _js_cache
-    if _js_cache is None:
-        _js_cache = (_DIR / "shared.js").read_text(encoding="utf-8")
-    return _js_cache
+    return _JS
 
 
 def apply_shared_placeholders(html: str) -> str:
     """Replace ``{{SHARED_CSS}}`` and ``{{SHARED_JS}}`` in *html*."""
-    return html.replace("{{SHARED_CSS}}", shared_css()).replace(
-        "{{SHARED_JS}}", shared_js()
-    )
+    return _SHARED_RE.sub(lambda m: _SHARED_TABLE[m.group(1)], html)
+
+
+_PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+
+def compile_template(template: str) -> list[str]:
+    """Split *template* once for repeated :func:`render_template` calls.
+
+    The result alternates literal text (even indices) and placeholder
+    names (odd indices).
+    """
+    return _PLACEHOLDER_RE.split(template)
+
+
+def render_template(parts: list[str], subs: dict[str, str]) -> str:
+    """Fill a :func:`compile_template` result with ``subs[NAME]`` values.
+
+    Names missing from *subs* are left as ``{{NAME}}``.
+    """
+    out = parts.copy()
+    for i in range(1, len(out), 2):
+        name = out[i]
+        out[i] = subs.get(name, "{{%s}}" % name)
+    return "".join(out)
+
+
+def compile_template_bytes(template: str) -> list[bytes | str]:
+    """Like :func:`compile_template`, for pages written straight to disk.
+
+    Literal text is UTF-8 encoded up front with ``{{SHARED_CSS}}`` and
+    ``{{SHARED_JS}}`` already inlined, so rendering only encodes the
+    page-specific values.  Encoded literals sit at even indices and the
+    remaining placeholder names at odd indices.
+    """
+    parts = compile_template(template)
+    out: list[bytes | str] = []
+    literal = parts[0].encode("utf-8")
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        if name == "SHARED_CSS":
+            literal += _CSS_BYTES
+        elif name == "SHARED_JS":
+            literal += _JS_BYTES
+        else:
+            out.append(literal)
+            out.append(name)
+            literal = b""
+        literal += parts[i + 1].encode("utf-8")
+    out.append(literal)
+    return out
+
+
+def render_template_bytes(
+    parts: list[bytes | str], subs: dict[str, str]
+) -> list[bytes]:
+    """Fill a :func:`compile_template_bytes` result, returning UTF-8 chunks.
+
+    The chunks are meant for ``writelines``; names missing from *subs* are
+    left as ``{{NAME}}``.
+    """
+    out = parts.copy()
+    for i in range(1, len(out), 2):
+        name = out[i]
+        out[i] = subs.get(name, "{{%s}}" % name).encode("utf-8")
+    return out
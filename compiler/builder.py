@@ -7,70 +7,561 @@ compiler directives where found.
 
 from __future__ import annotations
 
-import re
+import json
+import os
 import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from stat import S_IMODE
 
-from compiler.directives import apply_directive, detect_directive
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-# Hidden markdown files (e.g. .foo.md, .solving-guide.md) are never
-# included in the build output.  They exist in the source tree purely
-# as developer/author documentation.
-_HIDDEN_MD_RE = re.compile(r"^\..+\.md$", re.IGNORECASE)
+from compiler.directives import canonical_directive, detect_directive, iter_directive
 
-# Metadata files used by the compiler (e.g. .challenge.json) are also
+# Metadata files used by the compiler (e.g. .challenge.json) are
 # excluded from build output.
 _META_FILES = {".challenge.json", ".group.json"}
 
 
-def compile_site(source: Path, dest: Path) -> None:
+def _skip_reason(name: str) -> str | None:
+    """Return why a file called *name* is left out of the build, or *None*.
+
+    Hidden markdown files (e.g. .foo.md, .solving-guide.md) are never
+    included in the build output — they exist in the source tree purely as
+    developer/author documentation.  Equivalent to matching
+    ``^\\..+\\.md$`` case-insensitively, without the regex engine.
+    """
+    if name in _META_FILES:
+        return "metadata"
+    if len(name) > 4 and name[0] == "." and name[-3:].lower() == ".md":
+        return "hidden markdown"
+    return None
+
+
+def _walk(source: str, prefix: str = "") -> Iterator[tuple[str, os.DirEntry]]:
+    """Yield ``(rel, entry)`` for every entry below *source*, recursively.
+
+    Uses ``os.scandir`` so the file type comes straight from the directory
+    read instead of an extra ``stat`` per entry.  *rel* is the ``/``-joined
+    path relative to the walk root.  Children are sorted by name within each
+    directory, which gives a stable pre-order without sorting the whole tree.
+    """
+    with os.scandir(source) as it:
+        entries = list(it)
+    entries.sort(key=lambda e: e.name)
+    for entry in entries:
+        rel = prefix + entry.name
+        yield rel, entry
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(entry.path, rel + "/")
+
+
+# FICLONE and sendfile-to-a-regular-file are Linux-only.
+_IS_LINUX = sys.platform.startswith("linux")
+
+# ioctl request asking the filesystem (btrfs, xfs, ...) for a copy-on-write
+# clone of a whole file: <linux/fs.h> _IOW(0x94, 9, int).
+_FICLONE = 0x40049409
+
+_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def _copy_file(entry: os.DirEntry, dst_file: str) -> None:
+    """Copy *entry* to *dst_file*, carrying over its mode and timestamps.
+
+    On Linux this first tries a reflink (``FICLONE``), which shares the data
+    blocks instead of copying them, then falls back to moving the bytes
+    in-kernel with ``os.sendfile``.  Elsewhere it uses ``shutil.copyfile``.
+
+    The copy goes to a temporary file that then replaces *dst_file*, so an
+    earlier output copied from a read-only source is never reopened for
+    writing.  Hard links are deliberately not used: the output would share
+    an inode with the source, so editing a built file would edit the source
+    too.
+    """
+    st = entry.stat()
+    head, tail = os.path.split(dst_file)
+    fd, tmp = tempfile.mkstemp(prefix=f".{tail}.", suffix=".tmp", dir=head)
+    try:
+        if _IS_LINUX:
+            try:
+                src_fd = os.open(entry.path, os.O_RDONLY)
+                try:
+                    if not _reflink(src_fd, fd):
+                        _sendfile(src_fd, fd, st.st_size)
+                finally:
+                    os.close(src_fd)
+            finally:
+                os.close(fd)
+        else:
+            os.close(fd)
+            shutil.copyfile(entry.path, tmp)
+        os.chmod(tmp, S_IMODE(st.st_mode))
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, dst_file)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    """Clone *src_fd* into *dst_fd*; return *False* if unsupported."""
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+    except OSError:
+        return False
+    return True
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> None:
+    """Copy *size* bytes from *src_fd* to *dst_fd* inside the kernel."""
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+
+def _write_chunks(dst_file: str, chunks: Iterable[str]) -> None:
+    """UTF-8 encode *chunks* into *dst_file* as they are produced.
+
+    The chunks go to a temporary file beside *dst_file*, which replaces it
+    only once all of them are written, so a directive that fails part-way
+    (e.g. a bundle whose referenced file is missing) never leaves a
+    truncated output behind.
+    """
+    head, tail = os.path.split(dst_file)
+    fd, tmp = tempfile.mkstemp(prefix=f".{tail}.", suffix=".tmp", dir=head)
+    try:
+        try:
+            for chunk in chunks:
+                view = memoryview(chunk.encode("utf-8"))
+                while view:
+                    view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, dst_file)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _fast_rmtree(path: Path) -> None:
+    """Recursively delete *path*.
+
+    Shells out to the native ``rm -rf`` on POSIX, which is far quicker than
+    ``shutil.rmtree`` on large trees, and falls back to ``shutil.rmtree``
+    elsewhere or when ``rm`` is unavailable.
+    """
+    if os.name == "posix":
+        try:
+            subprocess.run(["rm", "-rf", "--", str(path)], check=True)
+            return
+        except (OSError, subprocess.CalledProcessError):
+            pass
+    shutil.rmtree(path)
+
+
+def _load_cache(cache_file: Path | None) -> dict[str, list]:
+    """Return the directive cache stored in *cache_file* (empty if absent)."""
+    if cache_file is None:
+        return {}
+    try:
+        with open(cache_file, "r", encoding="utf-8") as fh:
+            cache = json.load(fh)
+    except (json.JSONDecodeError, OSError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_cache(cache_file: Path, cache: dict[str, list]) -> None:
+    """Persist the directive cache to *cache_file*.
+
+    The cache is only an optimisation, so failing to write it (e.g. a
+    read-only directory) is reported but never fails the build.
+    """
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, "w", encoding="utf-8") as fh:
+            json.dump(cache, fh, separators=(",", ":"))
+    except OSError as exc:
+        print(f"  warning: could not save directive cache: {exc}", file=sys.stderr)
+
+
+def compile_site(
+    source: Path,
+    dest: Path,
+    cache_file: Path | None = None,
+    already_resolved: bool = False,
+) -> dict[str, list]:
     """Build the static site from *source* into *dest*.
 
-    *dest* is wiped clean before every build so the output is always a
-    faithful snapshot of the source with directives applied.
+    *dest* is synced rather than rebuilt from scratch: anything in it that
+    the source no longer produces is pruned first, so the output is always
+    a faithful snapshot of the source with directives applied.  Straight
+    copies whose output already has the source's ``st_mtime_ns`` and
+    ``st_size`` are not rewritten.  Directive output is always regenerated,
+    since it can depend on other files (siblings, metadata, bundles).
+
+    If *cache_file* is given, the detected directive of every file is
+    remembered there keyed by its relative path, ``st_mtime_ns`` and
+    ``st_size``, so unchanged files are not re-opened on the next build.
+    The cache must live outside *dest* — it names every source file,
+    including ``no_include`` ones.
+
+    Pass ``already_resolved=True`` when *source* and *dest* are already
+    absolute, symlink-free paths to skip resolving them again.
+
+    Returns the directive table that is written to *cache_file*.
+    """
+    if not already_resolved:
+        source = source.resolve()
+        dest = dest.resolve()
+
+    dest.mkdir(parents=True, exist_ok=True)
+
+    old_cache = _load_cache(cache_file)
+    new_cache: dict[str, list] = {}
+
+    # Pass 1 (sequential): walk the tree, create directories and decide
+    # which files to build.  The log keeps walk order: each item is either
+    # a finished line or the index of a job whose line is not known yet.
+    dirs: list[str] = []
+    jobs: list[tuple[str, os.DirEntry, str]] = []
+    log: list[str | int] = []
+    # rel -> is_dir for everything the build may produce
+    keep: dict[str, bool] = {}
+
+    for rel, entry in _walk(str(source)):
+        if entry.is_dir():
+            # A symlink to a directory is mirrored as an empty directory;
+            # _walk does not descend into it
+            dirs.append(rel)
+            keep[rel] = True
+            continue
+
+        # Skip hidden markdown (.*.md) and compiler metadata files
+        reason = _skip_reason(entry.name)
+        if reason is not None:
+            log.append(f"  skip   {rel}  ({reason})")
+            continue
+
+        keep[rel] = False
+        log.append(len(jobs))
+        jobs.append((rel, entry, os.path.join(dest, rel)))
+
+    # Drop stale output (deleted sources, file <-> directory swaps), then
+    # create directories — parents always precede children in walk order
+    existing: set[str] = set()
+    _prune(str(dest), keep, existing)
+    for rel in dirs:
+        if rel not in existing:
+            os.mkdir(os.path.join(dest, rel))
+
+    # Pass 2 (threaded): the per-file work is I/O bound, and the GIL is
+    # released during the underlying syscalls.
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as pool:
+        futures = [
+            pool.submit(_build_file, rel, entry, dst_file, old_cache.get(rel))
+            for rel, entry, dst_file in jobs
+        ]
+        results = [f.result() for f in futures]
+
+    # Emit the whole log with a single write rather than a print per file
+    for i, item in enumerate(log):
+        if isinstance(item, int):
+            new_cache[jobs[item][0]], log[i] = results[item]
+    if log:
+        sys.stdout.write("\n".join(log) + "\n")
+
+    if cache_file is not None:
+        _save_cache(cache_file, new_cache)
+    return new_cache
+
+
+def _prune(
+    dest: str,
+    keep: dict[str, bool],
+    existing: set[str],
+    prefix: str = "",
+) -> None:
+    """Remove entries under *dest* that are not in *keep* (or changed type).
+
+    *keep* maps ``/``-joined relative paths to whether they are directories.
+    Directories that survive are added to *existing*.
+    """
+    with os.scandir(dest) as it:
+        entries = list(it)
+    for entry in entries:
+        rel = prefix + entry.name
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if keep.get(rel) is not is_dir:
+            if is_dir:
+                _fast_rmtree(Path(entry.path))
+            else:
+                os.unlink(entry.path)
+        elif is_dir:
+            existing.add(rel)
+            _prune(entry.path, keep, existing, rel + "/")
+
+
+def watch_site(
+    source: Path,
+    dest: Path,
+    cache_file: Path | None = None,
+    interval: float = 0.5,
+) -> None:
+    """Build *source* into *dest*, then rebuild incrementally on changes.
+
+    The source tree is polled every *interval* seconds (``st_mtime_ns`` and
+    ``st_size`` per file).  Changed and new files are rebuilt, deleted ones
+    are removed from *dest*.  Files carrying a directive are rebuilt on any
+    change, since their output can depend on siblings (listings), metadata
+    (challenge pages) or referenced files (bundles).  Runs until Ctrl+C.
     """
     source = source.resolve()
     dest = dest.resolve()
 
-    if dest.exists():
-        shutil.rmtree(dest)
-    dest.mkdir(parents=True)
+    table = compile_site(source, dest, cache_file, already_resolved=True)
+    before = _snapshot(source)
+    errors: dict[str, str] = {}
+    retry: set[str] = set()
+    print(f"Watching {source} for changes  (Ctrl+C to stop)")
 
-    for src_file in sorted(source.rglob("*")):
-        rel = src_file.relative_to(source)
-        dst_file = dest / rel
+    try:
+        while True:
+            time.sleep(interval)
+            try:
+                after = _snapshot(source)
+            except FileNotFoundError:
+                # Something was deleted mid-scan — look again next tick
+                continue
+            if _changed(before, after):
+                retry = _rebuild(dest, before, after, table, errors, retry)
+            elif retry:
+                # Nothing changed: retry only the entries that failed
+                subset = {rel: after[rel] for rel in retry if rel in after}
+                retry = _rebuild(dest, subset, subset, table, errors, retry)
+            else:
+                continue
+            if cache_file is not None:
+                _save_cache(cache_file, table)
+            before = after
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
 
-        if src_file.is_dir():
-            dst_file.mkdir(parents=True, exist_ok=True)
-            continue
 
-        # Skip hidden markdown files (.*.md) — author-only documentation
-        if _HIDDEN_MD_RE.match(src_file.name):
-            print(f"  skip   {rel}  (hidden markdown)")
+_Snapshot = dict[str, tuple[os.DirEntry, tuple[int, int] | None]]
+
+
+def _snapshot(source: Path) -> _Snapshot:
+    """Walk *source*, pairing each entry with its :func:`_stamp`.
+
+    The stamps are taken now: ``DirEntry.stat()`` is lazy, so comparing
+    entries later would compare whatever is on disk at that point instead.
+    """
+    return {rel: (entry, _stamp(entry)) for rel, entry in _walk(str(source))}
+
+
+def _stamp(entry: os.DirEntry) -> tuple[int, int] | None:
+    """Return ``(st_mtime_ns, st_size)`` for a file entry, *None* for a dir."""
+    if entry.is_dir():
+        return None
+    st = entry.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _changed(before: _Snapshot, after: _Snapshot) -> bool:
+    """Return whether two snapshots from :func:`_snapshot` differ."""
+    if before.keys() != after.keys():
+        return True
+    return any(before[rel][1] != stamp for rel, (_, stamp) in after.items())
+
+
+def _rebuild(
+    dest: Path,
+    before: _Snapshot,
+    after: _Snapshot,
+    table: dict[str, list],
+    errors: dict[str, str],
+    retry: set[str],
+) -> set[str]:
+    """Bring *dest* from snapshot *before* up to date with *after*.
+
+    *table* is the directive table returned by :func:`compile_site`; it is
+    updated in place.  Paths in *retry* (the ones that failed last time)
+    are rebuilt, or removed, even if their stamp has not changed.  A file
+    that fails (e.g. half-saved invalid JSON) does not stop the others;
+    its error is printed once — *errors* remembers the last message per
+    path across calls — and the failed paths are returned.
+    """
+    log: list[str] = []
+    failed: set[str] = set()
+
+    def _fail(rel: str, exc: Exception) -> None:
+        failed.add(rel)
+        message = f"  error  {rel}: {exc}"
+        if errors.get(rel) != message:
+            errors[rel] = message
+            print(message, file=sys.stderr)
+
+    # Deepest paths first so files go before their directories
+    gone = (before.keys() | retry) - after.keys()
+    for rel in sorted(gone, reverse=True):
+        target = os.path.join(dest, rel)
+        try:
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(target)
+                except FileNotFoundError:
+                    pass
+        except OSError as exc:
+            _fail(rel, exc)
             continue
+        errors.pop(rel, None)
+        table.pop(rel, None)
+        log.append(f"  remove {rel}")
 
-        # Skip compiler metadata files (.challenge.json, etc.)
-        if src_file.name in _META_FILES:
-            print(f"  skip   {rel}  (metadata)")
+    for rel, (entry, stamp) in after.items():
+        old = before.get(rel)
+        unchanged = rel not in retry and old is not None and old[1] == stamp
+        try:
+            line = _rebuild_entry(dest, rel, entry, unchanged, table)
+        except (OSError, ValueError) as exc:
+            # Keep going: one broken file must not hold back the rest
+            _fail(rel, exc)
             continue
+        errors.pop(rel, None)
+        if line is not None:
+            log.append(line)
 
-        dst_file.parent.mkdir(parents=True, exist_ok=True)
+    if log:
+        sys.stdout.write("\n".join(log) + "\n")
+    return failed
 
-        directive = detect_directive(src_file)
-        if directive == "no_include":
-            print(f"  skip   {rel}")
-            continue
 
-        if directive is None:
-            # No directive — straight copy (preserves binary files too)
-            shutil.copy2(src_file, dst_file)
-            print(f"  copy  {rel}")
-        else:
-            # Compute the URL prefix for directory listings
-            url_prefix = "/" + rel.parent.as_posix()
-            if not url_prefix.endswith("/"):
-                url_prefix += "/"
-
-            transformed = apply_directive(src_file, directive, url_prefix)
-            dst_file.write_text(transformed, encoding="utf-8")
-            print(f"  {directive:20s} {rel}")
+def _rebuild_entry(
+    dest: Path,
+    rel: str,
+    entry: os.DirEntry,
+    unchanged: bool,
+    table: dict[str, list],
+) -> str | None:
+    """Rebuild one entry of a :func:`_rebuild` pass if it needs it.
+
+    Returns the log line, or *None* if nothing was written.
+    """
+    dst_file = os.path.join(dest, rel)
+    cached = table.get(rel)
+    if unchanged and (cached is None or cached[2] in (None, "no_include")):
+        return None
+
+    is_dir = entry.is_dir()
+    if not is_dir and os.path.isdir(dst_file) and not os.path.islink(dst_file):
+        # A directory was replaced by a file of the same name
+        shutil.rmtree(dst_file, ignore_errors=True)
+    elif is_dir and os.path.lexists(dst_file) and not os.path.isdir(dst_file):
+        # A file was replaced by a directory of the same name.  Other
+        # outputs are overwritten (or, for no_include, removed) by their
+        # handler, so a failed rebuild leaves the previous output in place.
+        os.unlink(dst_file)
+    if is_dir:
+        # Parents precede children in walk order, so one mkdir suffices
+        if not os.path.isdir(dst_file):
+            os.mkdir(dst_file)
+        return None
+    if _skip_reason(entry.name) is not None:
+        return None
+
+    table[rel], line = _build_file(rel, entry, dst_file, cached)
+    return line
+
+
+def _build_file(
+    rel: str,
+    entry: os.DirEntry,
+    dst_file: str,
+    cached: list | None,
+) -> tuple[list, str]:
+    """Copy or transform one source file into *dst_file*.
+
+    *cached* is the file's previous directive-cache entry, if any.  Returns
+    the new cache entry and the log line describing what was done.
+    """
+    st = entry.stat()
+    if (
+        isinstance(cached, list)
+        and len(cached) == 3
+        and cached[0] == st.st_mtime_ns
+        and cached[1] == st.st_size
+        and (cached[2] is None or canonical_directive(cached[2]) is not None)
+    ):
+        directive = canonical_directive(cached[2])
+    else:
+        directive = detect_directive(Path(entry.path))
+    cache_entry = [st.st_mtime_ns, st.st_size, directive]
+
+    handler = _HANDLERS.get(directive, _do_directive)
+    return cache_entry, handler(rel, entry, dst_file, directive)
+
+
+def _do_skip(rel: str, entry: os.DirEntry, dst_file: str, directive: str) -> str:
+    """``no_include`` — leave the file out of the build."""
+    # Drop output left over from before the file became no_include
+    try:
+        os.unlink(dst_file)
+    except FileNotFoundError:
+        pass
+    return f"  skip   {rel}"
+
+
+def _do_copy(rel: str, entry: os.DirEntry, dst_file: str, directive: None) -> str:
+    """No directive — straight copy (preserves binary files too)."""
+    st = entry.stat()
+    try:
+        dst_st = os.stat(dst_file)
+    except FileNotFoundError:
+        pass
+    else:
+        # _copy_file carries the source mtime and mode over, so a match
+        # means this is the output of an earlier build of the same file
+        if (
+            dst_st.st_mtime_ns == st.st_mtime_ns
+            and dst_st.st_size == st.st_size
+            and S_IMODE(dst_st.st_mode) == S_IMODE(st.st_mode)
+        ):
+            return f"  keep  {rel}"
+    _copy_file(entry, dst_file)
+    return f"  copy  {rel}"
+
+
+def _do_directive(rel: str, entry: os.DirEntry, dst_file: str, directive: str) -> str:
+    """Any other directive — write its transformed output."""
+    # Compute the URL prefix for directory listings
+    parent = rel.rpartition("/")[0]
+    url_prefix = "/" + parent + "/" if parent else "/"
+
+    _write_chunks(dst_file, iter_directive(Path(entry.path), directive, url_prefix))
+    return "  " + directive.ljust(20) + " " + rel
+
+
+# Directive -> handler; everything not listed goes through _do_directive.
+_HANDLERS = {None: _do_copy, "no_include": _do_skip}
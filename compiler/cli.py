@@ -3,18 +3,21 @@ CLI entry point for the CTF site compiler.
 
 Usage
 -----
-    python -m compiler compile <source_dir> [--output dist]
+    python -m compiler compile <source_dir> [--output dist] [--watch]
     python -m compiler compile-all [--output dist]
     python -m compiler serve  <source_dir> [--port 8000]
 """
 
 from __future__ import annotations
 
-import argparse
 import json
+import os
 import sys
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from pathlib import Path
+from types import SimpleNamespace
+from typing import NoReturn
 
 # Directories at the repo root that are *not* challenge or group sources.
 _IGNORE_DIRS = {
@@ -39,6 +42,26 @@ class ChallengeGroup:
     challenges: list[Path] = field(default_factory=list)
 
 
+# Parsed ``.group.json`` contents keyed by (path, st_mtime_ns).
+_GROUP_META_CACHE: dict[tuple[str, int], dict] = {}
+
+
+def _load_group_meta(path: str, st: os.stat_result) -> dict:
+    """Return the parsed ``.group.json`` at *path* (``{}`` if unreadable)."""
+    key = (path, st.st_mtime_ns)
+    meta = _GROUP_META_CACHE.get(key)
+    if meta is None:
+        try:
+            with open(path, "rb") as fh:
+                meta = json.loads(fh.read())
+        except (ValueError, OSError):
+            meta = {}
+        if not isinstance(meta, dict):
+            meta = {}
+        _GROUP_META_CACHE[key] = meta
+    return meta
+
+
 def _discover_groups(root: Path) -> list[ChallengeGroup]:
     """Walk *root* and return grouped challenge directories.
 
@@ -51,22 +74,32 @@ def _discover_groups(root: Path) -> list[ChallengeGroup]:
     groups: list[ChallengeGroup] = []
     ungrouped: list[Path] = []
 
-    for entry in sorted(root.iterdir()):
-        if not entry.is_dir() or entry.name in _IGNORE_DIRS or entry.name.startswith("."):
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda e: e.name)
+
+    for entry in entries:
+        if (
+            entry.name in _IGNORE_DIRS
+            or entry.name.startswith(".")
+            or not entry.is_dir(follow_symlinks=False)
+        ):
             continue
 
-        group_meta_file = entry / ".group.json"
-        if group_meta_file.exists():
+        group_meta_file = os.path.join(entry.path, ".group.json")
+        try:
+            group_st = os.stat(group_meta_file)
+        except OSError:
+            group_st = None
+
+        if group_st is not None:
             # This is a group directory — discover challenges inside it
-            try:
-                meta = json.loads(group_meta_file.read_text(encoding="utf-8"))
-            except (json.JSONDecodeError, OSError):
-                meta = {}
-
-            challenges = sorted(
-                p for p in entry.iterdir()
-                if p.is_dir() and not p.name.startswith(".")
-            )
+            meta = _load_group_meta(group_meta_file, group_st)
+
+            with os.scandir(entry.path) as it:
+                challenges = sorted(
+                    Path(e.path) for e in it
+                    if not e.name.startswith(".") and e.is_dir(follow_symlinks=False)
+                )
             if challenges:
                 groups.append(ChallengeGroup(
                     name=meta.get("name", entry.name.replace("-", " ").replace("_", " ").title()),
@@ -74,9 +107,9 @@ def _discover_groups(root: Path) -> list[ChallengeGroup]:
                     slug=entry.name,
                     challenges=challenges,
                 ))
-        elif (entry / ".challenge.json").exists():
+        elif os.path.exists(os.path.join(entry.path, ".challenge.json")):
             # Top-level standalone challenge
-            ungrouped.append(entry)
+            ungrouped.append(Path(entry.path))
 
     if ungrouped:
         groups.append(ChallengeGroup(
@@ -94,8 +127,22 @@ def _all_challenges(groups: list[ChallengeGroup]) -> list[Path]:
     return [c for g in groups for c in g.challenges]
 
 
-def _cmd_compile(args: argparse.Namespace) -> None:
-    from compiler.builder import compile_site
+# The checkout this package lives in; its .dist-cache/ is gitignored.
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _cache_file(name: str) -> Path:
+    """Return the directive-cache path for challenge *name*.
+
+    Caches live in ``.dist-cache/`` at the repo root, whatever the current
+    directory or output directory, so they are never published with the
+    site nor scattered wherever the compiler happens to be run from.
+    """
+    return _REPO_ROOT / ".dist-cache" / f"{name}.json"
+
+
+def _cmd_compile(args: SimpleNamespace) -> None:
+    from compiler.builder import compile_site, watch_site
 
     source = Path(args.source).resolve()
     out_root = Path(args.output).resolve()
@@ -106,11 +153,19 @@ def _cmd_compile(args: argparse.Namespace) -> None:
         sys.exit(1)
 
     print(f"Compiling {source} -> {dest}")
-    compile_site(source, dest)
+    if args.watch:
+        watch_site(source, dest, cache_file=_cache_file(source.name))
+        return
+    compile_site(
+        source,
+        dest,
+        cache_file=_cache_file(source.name),
+        already_resolved=True,
+    )
     print("Done.")
 
 
-def _cmd_compile_all(args: argparse.Namespace) -> None:
+def _cmd_compile_all(args: SimpleNamespace) -> None:
     from compiler.builder import compile_site
     from compiler.homepage import generate_homepage
 
@@ -134,7 +189,12 @@ def _cmd_compile_all(args: argparse.Namespace) -> None:
         # Output is always flat: dist/<challenge_name>/
         dest = out_root / source.name
         print(f"\nCompiling {source.relative_to(root)}/ -> {dest}")
-        compile_site(source, dest)
+        compile_site(
+            source,
+            dest,
+            cache_file=_cache_file(source.name),
+            already_resolved=True,
+        )
 
     # Generate the root homepage listing all challenges, grouped
     print("\nGenerating homepage...")
@@ -143,7 +203,7 @@ def _cmd_compile_all(args: argparse.Namespace) -> None:
     print("\nAll done.")
 
 
-def _cmd_serve(args: argparse.Namespace) -> None:
+def _cmd_serve(args: SimpleNamespace) -> None:
     from compiler.server import serve
 
     source = Path(args.source).resolve()
@@ -155,64 +215,149 @@ def _cmd_serve(args: argparse.Namespace) -> None:
     serve(source, port=args.port)
 
 
-def main(argv: list[str] | None = None) -> None:
-    parser = argparse.ArgumentParser(
-        prog="compiler",
-        description="CTF site compiler — build & serve with directive processing.",
-    )
-    sub = parser.add_subparsers(dest="command", required=True)
+_USAGE = """\
+usage: compiler <command> [options]
 
-    # -- compile -----------------------------------------------------------
-    p_compile = sub.add_parser(
-        "compile",
-        help="Apply directives and output a single challenge.",
-    )
-    p_compile.add_argument(
-        "source",
-        help="Path to the challenge source directory (e.g. pipeline/).",
-    )
-    p_compile.add_argument(
-        "-o",
-        "--output",
-        default="dist",
-        help="Output root directory (default: dist/). Challenge is written to dist/<name>/.",
-    )
-    p_compile.set_defaults(func=_cmd_compile)
+CTF site compiler — build & serve with directive processing.
 
-    # -- compile-all -------------------------------------------------------
-    p_all = sub.add_parser(
-        "compile-all",
-        help="Discover and compile every challenge directory.",
-    )
-    p_all.add_argument(
-        "-o",
-        "--output",
-        default="dist",
-        help="Output root directory (default: dist/).",
-    )
-    p_all.set_defaults(func=_cmd_compile_all)
+commands:
+  compile <source_dir> [-o/--output DIR] [-w/--watch]
+      Apply directives and output a single challenge to DIR/<name>/
+      (default DIR: dist).  With --watch, keep rebuilding changed files.
+  compile-all [-o/--output DIR]
+      Discover and compile every challenge directory (default DIR: dist).
+  serve <source_dir> [-p/--port PORT]
+      Serve a challenge with live directive processing (default PORT: 8000).
+"""
 
-    # -- serve -------------------------------------------------------------
-    p_serve = sub.add_parser(
-        "serve",
-        help="Serve a challenge with live directive processing.",
-    )
-    p_serve.add_argument(
-        "source",
-        help="Path to the challenge source directory (e.g. pipeline/).",
-    )
-    p_serve.add_argument(
-        "-p",
-        "--port",
-        type=int,
-        default=8000,
-        help="Port to listen on (default: 8000).",
-    )
-    p_serve.set_defaults(func=_cmd_serve)
+# Hand-rolled dispatch table — argparse costs more to import and set up
+# than the three commands need.
+#   command -> (handler, positional names, {dest: (flags, default)})
+# An option's value is converted with ``type(default)``; options with a
+# bool default are switches that take no value.
+_COMMANDS: dict[
+    str,
+    tuple[
+        Callable[[SimpleNamespace], None],
+        tuple[str, ...],
+        dict[str, tuple[tuple[str, ...], object]],
+    ],
+] = {
+    "compile": (
+        _cmd_compile,
+        ("source",),
+        {
+            "output": (("-o", "--output"), "dist"),
+            "watch": (("-w", "--watch"), False),
+        },
+    ),
+    "compile-all": (
+        _cmd_compile_all,
+        (),
+        {"output": (("-o", "--output"), "dist")},
+    ),
+    "serve": (
+        _cmd_serve,
+        ("source",),
+        {"port": (("-p", "--port"), 8000)},
+    ),
+}
+
+
+def _usage_error(message: str) -> NoReturn:
+    """Print *message* with the usage text and exit with status 2."""
+    sys.stderr.write(_USAGE)
+    print(f"compiler: error: {message}", file=sys.stderr)
+    sys.exit(2)
 
-    # -- dispatch ----------------------------------------------------------
-    args = parser.parse_args(argv)
-    args.func(args)
+
+def _match_flag(name: str, flags: list[str]) -> str:
+    """Expand *name* if it is an unambiguous prefix of a long flag.
+
+    Mirrors argparse, which accepts e.g. ``--out`` for ``--output``.  Any
+    other *name* is returned unchanged.
+    """
+    if name in flags or not name.startswith("--"):
+        return name
+    matches = [flag for flag in flags if flag.startswith(name)]
+    if len(matches) > 1:
+        _usage_error(f"ambiguous option: {name} could match {', '.join(matches)}")
+    return matches[0] if matches else name
+
+
+def _parse_args(
+    argv: list[str],
+) -> tuple[Callable[[SimpleNamespace], None], SimpleNamespace]:
+    """Split *argv* into the command handler and its parsed arguments."""
+    if not argv or argv[0] in ("-h", "--help"):
+        if not argv:
+            _usage_error("a command is required")
+        sys.stdout.write(_USAGE)
+        sys.exit(0)
+
+    command, rest = argv[0], argv[1:]
+    spec = _COMMANDS.get(command)
+    if spec is None:
+        _usage_error(
+            f"invalid command {command!r} (choose from {', '.join(_COMMANDS)})"
+        )
+    func, positionals, options = spec
+
+    values = {dest: default for dest, (_flags, default) in options.items()}
+    flag_dest = {flag: dest for dest, (flags, _) in options.items() for flag in flags}
+    given: list[str] = []
+
+    i = 0
+    while i < len(rest):
+        arg = rest[i]
+        i += 1
+        if arg == "--":
+            # Everything after a bare "--" is positional
+            given.extend(rest[i:])
+            break
+        if not arg.startswith("-") or arg == "-":
+            given.append(arg)
+            continue
+        if not arg.startswith("--") and len(arg) > 2 and arg[:2] in flag_dest:
+            # Short option with its value attached, e.g. -odist or -p8080
+            name, eq, value = arg[:2], "=", arg[2:].removeprefix("=")
+        else:
+            name, eq, value = arg.partition("=")
+        name = _match_flag(name, [*flag_dest, "--help"])
+        if name in ("-h", "--help"):
+            sys.stdout.write(_USAGE)
+            sys.exit(0)
+        dest = flag_dest.get(name)
+        if dest is None:
+            _usage_error(f"unrecognized arguments: {arg}")
+        if isinstance(options[dest][1], bool):
+            if eq:
+                _usage_error(f"argument {name}: ignored explicit argument {value!r}")
+            values[dest] = True
+            continue
+        if not eq:
+            if i >= len(rest):
+                _usage_error(f"argument {name}: expected one argument")
+            value = rest[i]
+            i += 1
+        try:
+            values[dest] = type(options[dest][1])(value)
+        except ValueError:
+            _usage_error(f"argument {name}: invalid value {value!r}")
+
+    if len(given) < len(positionals):
+        missing = ", ".join(positionals[len(given):])
+        _usage_error(f"the following arguments are required: {missing}")
+    if len(given) > len(positionals):
+        _usage_error(f"unrecognized arguments: {' '.join(given[len(positionals):])}")
+
+    values.update(zip(positionals, given))
+    return func, SimpleNamespace(**values)
+
+
+def main(argv: list[str] | None = None) -> None:
+    func, args = _parse_args(sys.argv[1:] if argv is None else argv)
+    func(args)
 
 
 if __name__ == "__main__":
@@ -16,11 +16,23 @@ import base64
 import json
 import os
 import re
-from datetime import datetime, timezone
+import sys
+import time
+from collections.abc import Callable, Iterator
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-from compiler.assets import apply_shared_placeholders
+try:
+    import orjson
+except ImportError:  # optional speed-up; stdlib json is the fallback
+    orjson = None
+
+from compiler.assets import (
+    apply_shared_placeholders,
+    compile_template,
+    render_template,
+)
 
 # Hidden markdown files (e.g. .foo.md) are excluded from directory listings.
 _HIDDEN_MD_RE = re.compile(r"^\..+\.md$", re.IGNORECASE)
@@ -41,20 +53,41 @@ KNOWN_DIRECTIVES = {
     "challenge_page",
 }
 
+# Canonical (interned) instance of each directive name, so detected names
+# can be compared by identity and used as cheap dict keys.
+_CANONICAL = {sys.intern(name): sys.intern(name) for name in KNOWN_DIRECTIVES}
+
+
+def canonical_directive(name: Optional[str]) -> Optional[str]:
+    """Return the interned directive called *name*, or *None* if unknown."""
+    return _CANONICAL.get(name) if name is not None else None
+
+
+# Directive headers are short, so only this much of a file is ever read
+# to look for one.
+_DETECT_PREFIX = 256
+
 
 def detect_directive(file_path: Path) -> Optional[str]:
     """Return the directive name found on the first line, or *None*."""
     try:
-        with open(file_path, "r", encoding="utf-8", errors="replace") as fh:
-            first_line = fh.readline()
-    except (OSError, UnicodeDecodeError):
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        head = os.read(fd, _DETECT_PREFIX)
+    except OSError:
         return None
+    finally:
+        os.close(fd)
+
+    # Only the first line may carry a directive
+    head = head.split(b"\n", 1)[0].split(b"\r", 1)[0]
+    first_line = head.decode("utf-8", "replace")
 
     m = _HTML_DIRECTIVE_RE.match(first_line) or _JSON_DIRECTIVE_RE.match(first_line)
     if m:
-        name = m.group(1).lower()
-        if name in KNOWN_DIRECTIVES:
-            return name
+        return _CANONICAL.get(m.group(1).lower())
     return None
 
 
@@ -68,10 +101,20 @@ def _fmt_size(size: int) -> str:
     return str(size).rjust(7)
 
 
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+           "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
 def _fmt_date(ts: float) -> str:
-    """Format a timestamp as ``dd-Mon-yyyy HH:MM``."""
-    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
-    return dt.strftime("%d-%b-%Y %H:%M")
+    """Format a timestamp as ``dd-Mon-yyyy HH:MM`` (UTC)."""
+    tm = time.gmtime(ts)
+    return "%02d-%s-%04d %02d:%02d" % (
+        tm.tm_mday, _MONTHS[tm.tm_mon - 1], tm.tm_year, tm.tm_hour, tm.tm_min,
+    )
+
+
+# Widest gap ever needed between a listing entry's link and its date
+_PAD = " " * 51
 
 
 def apply_directory_listing(file_path: Path, url_prefix: str = "/") -> str:
@@ -80,45 +123,32 @@ def apply_directory_listing(file_path: Path, url_prefix: str = "/") -> str:
     *url_prefix* is the URL path that corresponds to the directory (used in
     the ``<title>`` and heading).  It should end with ``/``.
     """
+    return "".join(_iter_directory_listing(file_path, url_prefix))
+
+
+def _iter_directory_listing(file_path: Path, url_prefix: str) -> Iterator[str]:
+    """Yield the directory listing page for *file_path* in pieces."""
     directory = file_path.parent
 
     # Collect entries (skip the index file itself and hidden markdown files)
+    # (os.scandir entries carry the file type, so is_dir() needs no stat)
     entries: list[tuple[str, bool, float, int]] = []
-    for child in sorted(directory.iterdir(), key=lambda p: p.name.lower()):
-        if child.name == file_path.name:
-            continue
-        if _HIDDEN_MD_RE.match(child.name):
-            continue
-        is_dir = child.is_dir()
-        stat = child.stat()
-        entries.append((child.name, is_dir, stat.st_mtime, stat.st_size))
-
-    # Build the <pre> block lines
-    lines: list[str] = []
-    lines.append('<a href="../">../</a>')
+    with os.scandir(directory) as it:
+        for child in it:
+            if child.name == file_path.name:
+                continue
+            if _HIDDEN_MD_RE.match(child.name):
+                continue
+            st = child.stat()
+            entries.append((child.name, child.is_dir(), st.st_mtime, st.st_size))
 
     # Directories first, then files — matching typical nginx behaviour
-    dirs = [(n, d, m, s) for n, d, m, s in entries if d]
-    files = [(n, d, m, s) for n, d, m, s in entries if not d]
-
-    for name, _is_dir, mtime, size in dirs + files:
-        display_name = name + "/" if _is_dir else name
-        href = display_name
-        # Pad name to 50 chars (nginx uses ~50 cols)
-        padded_name = display_name.ljust(50)
-        date_str = _fmt_date(mtime)
-        size_str = "   -" if _is_dir else _fmt_size(size)
-        link = f'<a href="{href}">{padded_name}</a>'
-        # The visible columns after the link close tag
-        padding = " " * max(1, 51 - len(display_name))
-        lines.append(f"{link}{padding}{date_str} {size_str}")
-
-    pre_block = "\n".join(lines)
+    entries.sort(key=lambda e: (not e[1], e[0].lower()))
 
     if not url_prefix.endswith("/"):
         url_prefix += "/"
 
-    return (
+    yield (
         "<!doctype html>\n"
         "<html>\n"
         "  <head>\n"
@@ -127,8 +157,23 @@ def apply_directory_listing(file_path: Path, url_prefix: str = "/") -> str:
         "  <body>\n"
         f"    <h1>Index of {url_prefix}</h1>\n"
         "    <hr />\n"
-        f"    <pre>{pre_block}\n"
-        "</pre>\n"
+        '    <pre><a href="../">../</a>'
+    )
+
+    for name, _is_dir, mtime, size in entries:
+        display_name = name + "/" if _is_dir else name
+        # Name padded to 50 chars (nginx uses ~50 cols), then the gap before
+        # the date column sliced from a shared run of spaces
+        yield '\n<a href="%s">%s</a>%s%s %s' % (
+            display_name,
+            display_name.ljust(50),
+            _PAD[:max(1, 51 - len(display_name))],
+            _fmt_date(mtime),
+            "   -" if _is_dir else _fmt_size(size),
+        )
+
+    yield (
+        "\n</pre>\n"
         "    <hr />\n"
         "    <address>nginx/1.25.3</address>\n"
         "  </body>\n"
@@ -141,9 +186,30 @@ def apply_directory_listing(file_path: Path, url_prefix: str = "/") -> str:
 # ---------------------------------------------------------------------------
 
 
+_HTML_COMMENT_RE = re.compile(r"<!--(?!\[).*?-->", re.DOTALL)
+
+# <pre>, <script>, <style> and <textarea> blocks are left untouched
+_PROTECT_RE = re.compile(
+    r"<(?:pre|script|style|textarea)\b[^>]*>.*?</(?:pre|script|style|textarea)>",
+    re.DOTALL | re.IGNORECASE,
+)
+# Placeholder left in place of a protected block while the rest of the
+# document is minified
+_PROTECTED_KEY_RE = re.compile(r"\x00PROTECT_(\d+)\x00")
+
+# One pass that drops whitespace around tag brackets and collapses any
+# other whitespace run to a single space.
+_MINIFY_RE = re.compile(r"\s*(<)\s*|\s*(>)\s*|\s+")
+
+
+def _minify_sub(m: re.Match) -> str:
+    """Keep the matched bracket, or a single space for plain whitespace."""
+    return m.group(1) or m.group(2) or " "
+
+
 def _strip_html_comments(html: str) -> str:
     """Remove HTML comments, but preserve conditional comments (<!--[if)."""
-    return re.sub(r"<!--(?!\[).*?-->", "", html, flags=re.DOTALL)
+    return _HTML_COMMENT_RE.sub("", html)
 
 
 def apply_html_minify(file_path: Path) -> str:
@@ -162,36 +228,24 @@ def apply_html_minify(file_path: Path) -> str:
     content = _HTML_DIRECTIVE_RE.sub("", content, count=1)
 
     # Separate <pre>, <script>, <style> blocks so we don't mangle them
-    protected: dict[str, str] = {}
-    counter = 0
+    protected: list[str] = []
 
     def _protect(m: re.Match) -> str:
-        nonlocal counter
-        key = f"\x00PROTECT_{counter}\x00"
-        counter += 1
-        protected[key] = m.group(0)
-        return key
-
-    content = re.sub(
-        r"(<(?:pre|script|style|textarea)\b[^>]*>)(.*?)(</(?:pre|script|style|textarea)>)",
-        _protect,
-        content,
-        flags=re.DOTALL | re.IGNORECASE,
-    )
+        protected.append(m.group(0))
+        return f"\x00PROTECT_{len(protected) - 1}\x00"
+
+    content = _PROTECT_RE.sub(_protect, content)
 
     # Strip comments
     content = _strip_html_comments(content)
 
-    # Collapse whitespace
-    content = re.sub(r"\s+", " ", content)
+    # Collapse whitespace and remove spaces around tags
+    content = _MINIFY_RE.sub(_minify_sub, content)
 
-    # Remove spaces around tags
-    content = re.sub(r"\s*>\s*", ">", content)
-    content = re.sub(r"\s*<\s*", "<", content)
-
-    # Restore protected blocks
-    for key, val in protected.items():
-        content = content.replace(key, val)
+    # Restore protected blocks in a single pass (a block whose placeholder
+    # was inside a stripped comment is gone, as intended)
+    if protected:
+        content = _PROTECTED_KEY_RE.sub(lambda m: protected[int(m.group(1))], content)
 
     return content.strip() + "\n"
 
@@ -212,10 +266,30 @@ def apply_json_minify(file_path: Path) -> str:
     # Strip the directive line
     raw = _JSON_DIRECTIVE_RE.sub("", raw, count=1).lstrip("\n")
 
+    # Parsed and serialised with the stdlib only: orjson would turn integers
+    # wider than 64 bits into floats, and the output (e.g. ASCII escaping)
+    # must not depend on whether it is installed
     data = json.loads(raw)
     return json.dumps(data, separators=(",", ":")) + "\n"
 
 
+def _json_loads(data: bytes | str) -> Any:
+    """Parse JSON with orjson when it is installed, else the stdlib parser.
+
+    Anything orjson rejects but ``json`` accepts (NaN, lone surrogates)
+    falls through to ``json.loads``.  Results can still differ for numbers
+    (orjson reads integers wider than 64 bits as floats), so this is only
+    used for ``.challenge.json`` metadata, never for output that is
+    re-serialised.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
 # ---------------------------------------------------------------------------
 # Dispatch
 # ---------------------------------------------------------------------------
@@ -225,6 +299,10 @@ _BASE64_BUNDLE_ARG_RE = re.compile(
     r"\A\s*//\s*COMPILER:\s*base64_bundle\s+(\S+)", re.IGNORECASE
 )
 
+# A leading no_include directive line in the bundled source (matched on the
+# raw bytes, which are never decoded)
+_NO_INCLUDE_LEAD_RE = re.compile(rb"\A\s*//\s*COMPILER:\s*no_include[^\n]*\n?")
+
 
 def apply_base64_bundle(file_path: Path) -> str:
     """Read the referenced file, base64-encode it, and append an eval(atob(...)).
@@ -239,6 +317,11 @@ def apply_base64_bundle(file_path: Path) -> str:
     The directive line is stripped.  Everything after it (the comment block)
     is kept verbatim, and ``eval(atob("..."));`` is appended.
     """
+    return "".join(_iter_base64_bundle(file_path))
+
+
+def _iter_base64_bundle(file_path: Path) -> Iterator[str]:
+    """Yield the ``base64_bundle`` output for *file_path* in pieces."""
     with open(file_path, "r", encoding="utf-8") as fh:
         first_line = fh.readline()
         rest = fh.read()
@@ -255,14 +338,19 @@ def apply_base64_bundle(file_path: Path) -> str:
     if not ref_path.is_file():
         raise FileNotFoundError(f"base64_bundle: referenced file not found: {ref_path}")
 
-    with open(ref_path, "r", encoding="utf-8") as fh:
+    with open(ref_path, "rb") as fh:
         src = fh.read()
+    # Match the newline translation text mode used to apply
+    if b"\r" in src:
+        src = src.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
 
     # Strip a leading no_include directive line from the source if present
-    src = re.sub(r"\A\s*//\s*COMPILER:\s*no_include[^\n]*\n?", "", src, count=1)
+    src = _NO_INCLUDE_LEAD_RE.sub(b"", src, count=1)
 
-    encoded = base64.b64encode(src.encode("utf-8")).decode("ascii")
-    return rest + f'eval(atob("{encoded}"));\n'
+    yield rest
+    yield 'eval(atob("'
+    yield base64.b64encode(src).decode("ascii")
+    yield '"));\n'
 
 
 # ---------------------------------------------------------------------------
@@ -279,6 +367,57 @@ _DIFFICULTY_COLORS = {
 }
 
 
+# Word separators in directory names, for fallback titles
+_SLUG_SEPARATORS = str.maketrans("-_", "  ")
+
+
+def slug_title(slug: str) -> str:
+    """Turn a directory name like ``my-cool_chal`` into ``My Cool Chal``."""
+    return slug.translate(_SLUG_SEPARATORS).title()
+
+
+@lru_cache(maxsize=16)
+def difficulty_color(difficulty: str) -> str:
+    """Return the badge colour for *difficulty* (case-insensitive)."""
+    return _DIFFICULTY_COLORS.get(difficulty.lower(), "#6b7280")
+
+
+def _load_challenge_template() -> list[str]:
+    """Return compiled ``challenge.html``, re-reading it only when it changes."""
+    return _read_template(_CHALLENGE_TEMPLATE_PATH.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=1)
+def _read_template(mtime_ns: int) -> list[str]:
+    """Read and compile ``challenge.html`` (*mtime_ns* is only the cache key)."""
+    return compile_template(_CHALLENGE_TEMPLATE_PATH.read_text(encoding="utf-8"))
+
+
+def load_challenge_meta(challenge_root: Path) -> dict | None:
+    """Return parsed ``.challenge.json`` for *challenge_root*.
+
+    *None* if it is absent or unreadable.  Used by both challenge pages and
+    the homepage; parses are cached per ``(path, st_mtime_ns, st_size)`` so
+    repeated builds — and the dev server — only re-read edited metadata.
+    """
+    meta_file = challenge_root / ".challenge.json"
+    try:
+        st = meta_file.stat()
+    except OSError:
+        return None
+    return _parse_challenge_meta(str(meta_file), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=256)
+def _parse_challenge_meta(path: str, mtime_ns: int, size: int) -> dict | None:
+    """Parse the ``.challenge.json`` at *path* (stat fields are the cache key)."""
+    try:
+        with open(path, "rb") as fh:
+            return _json_loads(fh.read())
+    except (ValueError, OSError):
+        return None
+
+
 def apply_challenge_page(file_path: Path) -> str:
     """Wrap challenge body content in the shared challenge page template.
 
@@ -296,43 +435,59 @@ def apply_challenge_page(file_path: Path) -> str:
 
     # Find .challenge.json — challenge root is parent of challenge/
     challenge_root = file_path.parent.parent
-    meta_file = challenge_root / ".challenge.json"
-    meta: dict = {}
-    if meta_file.exists():
-        try:
-            meta = json.loads(meta_file.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
-            pass
+    meta = load_challenge_meta(challenge_root) or {}
 
     slug = challenge_root.name
-    title = meta.get("title", slug.replace("-", " ").replace("_", " ").title())
+    title = meta["title"] if "title" in meta else slug_title(slug)
     difficulty = meta.get("difficulty", "Unknown")
-    diff_color = _DIFFICULTY_COLORS.get(difficulty.lower(), "#6b7280")
+    diff_color = difficulty_color(difficulty)
     flag_hash = meta.get("flag_hash", "")
 
-    template = _CHALLENGE_TEMPLATE_PATH.read_text(encoding="utf-8")
-
-    html = (
-        template
-        .replace("{{TITLE}}", _html_escape(title))
-        .replace("{{DIFFICULTY}}", _html_escape(difficulty))
-        .replace("{{DIFF_COLOR}}", diff_color)
-        .replace("{{SLUG}}", _html_escape(slug))
-        .replace("{{FLAG_HASH}}", flag_hash)
-        .replace("{{BODY}}", body)
-    )
+    html = render_template(_load_challenge_template(), {
+        "TITLE": _html_escape(title),
+        "DIFFICULTY": _html_escape(difficulty),
+        "DIFF_COLOR": diff_color,
+        "SLUG": _html_escape(slug),
+        "FLAG_HASH": flag_hash,
+        "BODY": body,
+    })
 
     return apply_shared_placeholders(html)
 
 
+_HTML_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+})
+
+
 def _html_escape(text: str) -> str:
     """Minimal HTML/JS-safe escaping."""
-    return (
-        text.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-    )
+    return text.translate(_HTML_ESCAPE_TABLE)
+
+
+def _no_include(file_path: Path, url_prefix: str) -> str:
+    # Should be handled by the caller (builder / server) — never applied.
+    raise ValueError("no_include files should be skipped, not applied")
+
+
+# Directive name -> implementation, all called as fn(file_path, url_prefix)
+_APPLY: dict[str, Callable[[Path, str], str]] = {
+    "directory_listing": apply_directory_listing,
+    "html_minify": lambda file_path, url_prefix: apply_html_minify(file_path),
+    "json_minify": lambda file_path, url_prefix: apply_json_minify(file_path),
+    "base64_bundle": lambda file_path, url_prefix: apply_base64_bundle(file_path),
+    "challenge_page": lambda file_path, url_prefix: apply_challenge_page(file_path),
+    "no_include": _no_include,
+}
+
+# Directives whose output can be produced in pieces
+_ITER: dict[str, Callable[[Path, str], Iterator[str]]] = {
+    "directory_listing": _iter_directory_listing,
+    "base64_bundle": lambda file_path, url_prefix: _iter_base64_bundle(file_path),
+}
 
 
 def apply_directive(
@@ -341,17 +496,23 @@ def apply_directive(
     url_prefix: str = "/",
 ) -> str:
     """Apply *directive* to *file_path* and return the transformed content."""
-    if directive == "directory_listing":
-        return apply_directory_listing(file_path, url_prefix)
-    if directive == "html_minify":
-        return apply_html_minify(file_path)
-    if directive == "json_minify":
-        return apply_json_minify(file_path)
-    if directive == "base64_bundle":
-        return apply_base64_bundle(file_path)
-    if directive == "challenge_page":
-        return apply_challenge_page(file_path)
-    if directive == "no_include":
-        # Should be handled by the caller (builder / server) — never applied.
-        raise ValueError("no_include files should be skipped, not applied")
-    raise ValueError(f"Unknown directive: {directive!r}")
+    fn = _APPLY.get(directive)
+    if fn is None:
+        raise ValueError(f"Unknown directive: {directive!r}")
+    return fn(file_path, url_prefix)
+
+
+def iter_directive(
+    file_path: Path,
+    directive: str,
+    url_prefix: str = "/",
+) -> Iterator[str]:
+    """Like :func:`apply_directive`, but yield the output in pieces.
+
+    Lets callers stream large outputs (bundled scripts, long listings) to
+    disk without joining them into one string first.
+    """
+    fn = _ITER.get(directive)
+    if fn is not None:
+        return fn(file_path, url_prefix)
+    return iter((apply_directive(file_path, directive, url_prefix),))
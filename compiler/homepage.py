@@ -14,10 +14,13 @@ The HTML template lives in ``compiler/homepage.html`` alongside this module.
 from __future__ import annotations
 
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from compiler.assets import apply_shared_placeholders
+from compiler.assets import compile_template_bytes, render_template_bytes
+from compiler.directives import difficulty_color, load_challenge_meta, slug_title
 
 if TYPE_CHECKING:
     from compiler.cli import ChallengeGroup
@@ -25,47 +28,44 @@ if TYPE_CHECKING:
 _TEMPLATE_PATH = Path(__file__).with_name("homepage.html")
 
 
-def _load_template() -> str:
-    """Read the HTML template from disk."""
-    return _TEMPLATE_PATH.read_text(encoding="utf-8")
+@lru_cache(maxsize=1)
+def _load_template() -> list[bytes | str]:
+    """Read, compile and pre-encode the HTML template (once per process)."""
+    return compile_template_bytes(_TEMPLATE_PATH.read_text(encoding="utf-8"))
 
 
-def _load_challenge_meta(challenge_dir: Path) -> dict | None:
-    """Return parsed ``.challenge.json`` or *None* if it doesn't exist."""
-    meta_file = challenge_dir / ".challenge.json"
-    if not meta_file.exists():
-        return None
+def _build_card_html(cdir: Path) -> tuple[str, str | None]:
+    """Return (card_html, flag_hash_or_None) for a single challenge."""
     try:
-        with open(meta_file, "r", encoding="utf-8") as fh:
-            return json.load(fh)
-    except (json.JSONDecodeError, OSError):
-        return None
-
+        st = (cdir / ".challenge.json").stat()
+    except OSError:
+        return _render_card(cdir, None, None)
+    return _render_card(cdir, st.st_mtime_ns, st.st_size)
 
-_DIFFICULTY_COLORS = {
-    "easy": "#22c55e",
-    "medium": "#e05a33",
-    "hard": "#ef4444",
-    "insane": "#a855f7",
-}
 
+@lru_cache(maxsize=None)
+def _render_card(
+    cdir: Path, mtime_ns: int | None, size: int | None
+) -> tuple[str, str | None]:
+    """Render the card for *cdir* (metadata stat fields are the cache key).
 
-def _build_card_html(cdir: Path) -> tuple[str, str | None]:
-    """Return (card_html, js_hash_entry_or_None) for a single challenge."""
-    meta = _load_challenge_meta(cdir)
+    Repeated homepage builds only re-render challenges whose
+    ``.challenge.json`` changed.
+    """
+    slug = cdir.name
+    meta = load_challenge_meta(cdir) if mtime_ns is not None else None
     if meta is None:
+        # Missing or unreadable .challenge.json
         meta = {
-            "title": cdir.name.replace("-", " ").replace("_", " ").title(),
+            "title": slug_title(slug),
             "difficulty": "Unknown",
             "summary": "No description available.",
             "flag_hash": "",
         }
 
-    slug = cdir.name
     title = _escape(meta.get("title", slug))
     difficulty = meta.get("difficulty", "Unknown")
-    diff_lower = difficulty.lower()
-    diff_color = _DIFFICULTY_COLORS.get(diff_lower, "#6b7280")
+    diff_color = difficulty_color(difficulty)
     summary = _escape(meta.get("summary", ""))
     flag_hash = meta.get("flag_hash", "")
 
@@ -87,8 +87,7 @@ def _build_card_html(cdir: Path) -> tuple[str, str | None]:
         f"          </div>"
     )
 
-    js_entry = f'    "{slug}": "{flag_hash}"' if flag_hash else None
-    return card, js_entry
+    return card, str(flag_hash) if flag_hash else None
 
 
 def generate_homepage(groups: list[ChallengeGroup], dest: Path) -> None:
@@ -96,74 +95,90 @@ def generate_homepage(groups: list[ChallengeGroup], dest: Path) -> None:
 
     *groups* comes from ``compiler.cli._discover_groups()``.
     """
-    sections_html = []
-    all_js_entries = []
+    # The whole groups block is accumulated as one list of fragments and
+    # joined once, rather than joining cards, then sections, then the page.
+    parts: list[str] = []
+    flag_hashes: dict[str, str] = {}
+    # Group membership map for JS: { slug: [challenge1, ...] }
+    group_map_entries = []
     total_challenges = 0
 
+    # Building a card is dominated by reading its .challenge.json, so the
+    # reads are overlapped on a thread pool; map() preserves the order.
+    all_dirs = [cdir for group in groups for cdir in group.challenges]
+    with ThreadPoolExecutor(max_workers=min(32, len(all_dirs) or 1)) as pool:
+        built = iter(list(pool.map(_build_card_html, all_dirs)))
+
     for group in groups:
-        cards = []
-        for cdir in group.challenges:
-            card_html, js_entry = _build_card_html(cdir)
-            cards.append(card_html)
-            if js_entry:
-                all_js_entries.append(js_entry)
-            total_challenges += 1
-
-        cards_block = "\n".join(cards)
-        count = len(group.challenges)
+        if parts:
+            parts.append("\n\n")
+        slug = _escape(group.slug)
+        description = group.description
+        challenges = group.challenges
+        count = len(challenges)
         desc_html = (
-            f'\n          <p class="group-description">{_escape(group.description)}</p>'
-            if group.description
+            f'\n          <p class="group-description">{_escape(description)}</p>'
+            if description
             else ""
         )
 
-        sections_html.append(
-            f'        <div class="group" data-group="{_escape(group.slug)}">\n'
+        parts.append(
+            f'        <div class="group" data-group="{slug}">\n'
             f'          <div class="group-header" onclick="_toggleGroup(this)">\n'
             f'            <div class="group-header-left">\n'
             f'              <span class="group-chevron">&#9662;</span>\n'
             f'              <h2 class="group-title">{_escape(group.name)}</h2>\n'
             f'              <span class="group-count">{count}</span>\n'
             f"            </div>\n"
-            f'            <span class="group-progress" data-group-progress="{_escape(group.slug)}"></span>\n'
+            f'            <span class="group-progress" data-group-progress="{slug}"></span>\n'
             f"          </div>{desc_html}\n"
             f'          <div class="group-body">\n'
-            f"{cards_block}\n"
-            f"          </div>\n"
-            f"        </div>"
         )
-
-    groups_block = "\n\n".join(sections_html)
-    hashes_js = ",\n".join(all_js_entries)
-
-    # Build group membership map for JS: { slug: [challenge1, ...] }
-    group_map_entries = []
-    for group in groups:
-        slugs = ", ".join(f'"{c.name}"' for c in group.challenges)
-        group_map_entries.append(f'    "{_escape(group.slug)}": [{slugs}]')
+        for i, cdir in enumerate(challenges):
+            card_html, flag_hash = next(built)
+            if i:
+                parts.append("\n")
+            parts.append(card_html)
+            if flag_hash:
+                flag_hashes[cdir.name] = flag_hash
+        total_challenges += count
+        parts.append("\n          </div>\n        </div>")
+
+        # JSON arrays are valid JS, and names with quotes stay well-formed
+        slugs = json.dumps([c.name for c in challenges], ensure_ascii=False)
+        group_map_entries.append(f'    "{slug}": {slugs}')
+
+    groups_block = "".join(parts)
+    # One JSON object (valid JS) with its braces dropped, since the template
+    # already has them; indent=4 lines the entries up with the script
+    hashes_js = json.dumps(flag_hashes, indent=4, ensure_ascii=False)[2:-2]
     group_map_js = ",\n".join(group_map_entries)
 
-    html = (
-        _load_template()
-        .replace("{{GROUPS}}", groups_block)
-        .replace("{{HASHES}}", hashes_js)
-        .replace("{{COUNT}}", str(total_challenges))
-        .replace("{{GROUP_MAP}}", group_map_js)
-    )
-    html = apply_shared_placeholders(html)
+    # Only these values are encoded here; the template's static text and
+    # the shared CSS/JS were encoded once when it was loaded
+    chunks = render_template_bytes(_load_template(), {
+        "GROUPS": groups_block,
+        "HASHES": hashes_js,
+        "COUNT": str(total_challenges),
+        "GROUP_MAP": group_map_js,
+    })
 
     dest.mkdir(parents=True, exist_ok=True)
-    (dest / "index.html").write_text(html, encoding="utf-8")
+    with open(dest / "index.html", "wb") as fh:
+        fh.writelines(chunks)
     print(
         f"  homepage  index.html  ({total_challenges} challenge(s) in {len(groups)} group(s))"
     )
 
 
+_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+})
+
+
 def _escape(text: str) -> str:
     """Minimal HTML escaping."""
-    return (
-        text.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-    )
+    return text.translate(_ESCAPE_TABLE)
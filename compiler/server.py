@@ -9,14 +9,16 @@ version without an explicit build step.
 from __future__ import annotations
 
 import mimetypes
+import os
 import posixpath
 import re
+import sys
 import urllib.parse
-from functools import partial
+from functools import lru_cache, partial
 from http import HTTPStatus
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from socketserver import ThreadingMixIn
+from stat import S_ISDIR, S_ISREG
 
 from compiler.directives import apply_directive, detect_directive
 
@@ -24,21 +26,61 @@ from compiler.directives import apply_directive, detect_directive
 # served — they contain author-only documentation / spoilers.
 _HIDDEN_MD_RE = re.compile(r"^\..+\.md$", re.IGNORECASE)
 
+# Marks a request whose directive has not been looked up yet
+_UNKNOWN = object()
 
-class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
-    """Handle each request in a separate thread to avoid blocking."""
+# Directives whose output depends only on the file itself, so a rendered
+# response can be reused until the file changes.
+_PURE_DIRECTIVES = frozenset({"html_minify", "json_minify"})
 
-    daemon_threads = True
+
+@lru_cache(maxsize=1024)
+def _detect_cached(path: str, mtime_ns: int, size: int) -> str | None:
+    """Return the directive of *path* (stat fields are the cache key)."""
+    return detect_directive(Path(path))
+
+
+def _detect(file_path: Path) -> str | None:
+    """Like :func:`detect_directive`, but skips unchanged files."""
+    try:
+        st = file_path.stat()
+    except OSError:
+        return None
+    return _detect_cached(str(file_path), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=1024)
+def _content_type(name: str) -> str:
+    """Guess the Content-Type for a file called *name*."""
+    ctype, _ = mimetypes.guess_type(name)
+    return ctype or "application/octet-stream"
+
+
+@lru_cache(maxsize=256)
+def _render_cached(path: str, mtime_ns: int, size: int, directive: str) -> bytes:
+    """Apply a pure *directive* to *path* (stat fields are the cache key)."""
+    return apply_directive(Path(path), directive).encode("utf-8")
 
 
 class _CompilerHandler(SimpleHTTPRequestHandler):
     """HTTP handler that applies directives before serving responses."""
 
+    # Buffer the status line, headers and body into as few send() calls as
+    # possible, and send them without waiting on Nagle's algorithm
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
     # Set by the factory wrapper
     source_root: Path
+    # Directive of the requested file once send_head has looked it up
+    _directive: str | None | object = _UNKNOWN
 
     def __init__(self, *args, source_root: Path, **kwargs):
         self.source_root = source_root
+        # source_root is already resolved by serve(); kept as strings so
+        # _translate_path needs no Path objects
+        self._root = str(source_root)
+        self._root_prefix = os.path.join(self._root, "")
         super().__init__(*args, directory=str(source_root), **kwargs)
 
     # ------------------------------------------------------------------
@@ -51,10 +93,14 @@ class _CompilerHandler(SimpleHTTPRequestHandler):
             self.send_error(HTTPStatus.NOT_FOUND, "File not found")
             return None
 
-        file_path = Path(path)
+        # One stat drives every type check below
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
 
         # If the path is a directory, look for index.html inside it
-        if file_path.is_dir():
+        if st is not None and S_ISDIR(st.st_mode):
             # Redirect to add trailing slash (matches nginx / Apache behaviour
             # and ensures relative links in directory listings resolve correctly)
             parsed = urllib.parse.urlparse(self.path)
@@ -67,24 +113,35 @@ class _CompilerHandler(SimpleHTTPRequestHandler):
                 self.end_headers()
                 return None
 
-            index = file_path / "index.html"
-            if index.is_file():
-                file_path = index
+            index = os.path.join(path, "index.html")
+            try:
+                index_st = os.stat(index)
+            except OSError:
+                index_st = None
+            if index_st is not None and S_ISREG(index_st.st_mode):
+                # The request itself named a directory, which has no directive
+                self._directive = None
+                path, st = index, index_st
             else:
                 # No index — fall back to built-in directory listing
                 return super().send_head()
 
-        if not file_path.is_file():
+        if st is None or not S_ISREG(st.st_mode):
             self.send_error(HTTPStatus.NOT_FOUND, "File not found")
             return None
 
+        file_path = Path(path)
+
         # Block hidden markdown files (.*.md)
         if _HIDDEN_MD_RE.match(file_path.name):
             self.send_error(HTTPStatus.NOT_FOUND, "File not found")
             return None
 
         # Check for a compiler directive
-        directive = detect_directive(file_path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        directive = _detect_cached(*key)
+        if self._directive is _UNKNOWN:
+            self._directive = directive
 
         if directive == "no_include":
             self.send_error(HTTPStatus.NOT_FOUND, "File not found")
@@ -101,7 +158,11 @@ class _CompilerHandler(SimpleHTTPRequestHandler):
             if not url_prefix.endswith("/"):
                 url_prefix += "/"
 
-            body = apply_directive(file_path, directive, url_prefix)
+            if directive in _PURE_DIRECTIVES:
+                encoded = _render_cached(*key, directive)
+            else:
+                body = apply_directive(file_path, directive, url_prefix)
+                encoded = body.encode("utf-8")
         except Exception as exc:
             self.send_error(
                 HTTPStatus.INTERNAL_SERVER_ERROR,
@@ -109,12 +170,7 @@ class _CompilerHandler(SimpleHTTPRequestHandler):
             )
             return None
 
-        encoded = body.encode("utf-8")
-
-        # Guess content type
-        ctype, _ = mimetypes.guess_type(file_path.name)
-        if ctype is None:
-            ctype = "application/octet-stream"
+        ctype = _content_type(file_path.name)
 
         self.send_response(HTTPStatus.OK)
         self.send_header("Content-Type", ctype)
@@ -125,11 +181,23 @@ class _CompilerHandler(SimpleHTTPRequestHandler):
         self.wfile.write(encoded)
         return None  # we already wrote the body
 
+    # ------------------------------------------------------------------
+    # Plain files go straight from the page cache to the socket
+    # (socket.sendfile falls back to read/send when sendfile(2) can't be
+    # used, e.g. for the in-memory directory listing).
+    # ------------------------------------------------------------------
+    def copyfile(self, source, outputfile):
+        if outputfile is not self.wfile:
+            return super().copyfile(source, outputfile)
+        self.wfile.flush()
+        self.connection.sendfile(source)
+
     # ------------------------------------------------------------------
     # Swallow broken-pipe errors raised when the client disconnects
     # before we finish writing the response.
     # ------------------------------------------------------------------
     def handle_one_request(self):
+        self._directive = _UNKNOWN
         try:
             super().handle_one_request()
         except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
@@ -149,32 +217,36 @@ class _CompilerHandler(SimpleHTTPRequestHandler):
         parts = path.split("/")
         parts = [p for p in parts if p and p != ".."]
 
-        result = self.source_root
-        for part in parts:
-            result = result / part
+        path = os.path.join(self._root, *parts)
 
         # Security: make sure we haven't escaped the root
         try:
-            result.resolve().relative_to(self.source_root.resolve())
-        except ValueError:
+            real = os.path.realpath(path)
+        except ValueError:  # e.g. an embedded NUL byte
+            return None
+        if real != self._root and not real.startswith(self._root_prefix):
             return None
 
-        return str(result)
+        return path
 
     # Quieter logging
     def log_message(self, fmt, *args):
         directive = ""
-        # Quick peek to annotate the log
+        # Annotate the log with the directive send_head found, or take a
+        # quick peek if this request never got that far
         try:
-            translated = self._translate_path(self.path)
-            if translated:
-                d = detect_directive(Path(translated))
-                if d:
-                    directive = f"  [{d}]"
+            d = getattr(self, "_directive", _UNKNOWN)
+            if d is _UNKNOWN:
+                translated = self._translate_path(self.path)
+                d = _detect(Path(translated)) if translated else None
+            if d:
+                directive = f"  [{d}]"
         except Exception:
             pass
         try:
-            print(f"  {self.address_string()} {fmt % args}{directive}")
+            # One write per line, so lines from concurrent request threads
+            # never interleave with each other's newlines
+            sys.stdout.write(f"  {self.address_string()} {fmt % args}{directive}\n")
         except (BrokenPipeError, ConnectionResetError):
             pass
 
@@ -182,9 +254,12 @@ class _CompilerHandler(SimpleHTTPRequestHandler):
 def serve(source: Path, port: int = 8000, bind: str = "0.0.0.0") -> None:
     """Start the dev server rooted at *source* on *bind*:*port*."""
     source = source.resolve()
+    # Load the system MIME tables now rather than on the first request
+    mimetypes.init()
     handler = partial(_CompilerHandler, source_root=source)
 
-    httpd = _ThreadingHTTPServer((bind, port), handler)
+    # Each request is handled in its own (daemon) thread
+    httpd = ThreadingHTTPServer((bind, port), handler)
     print(f"Serving {source} at http://{bind}:{port}  (Ctrl+C to stop)")
     try:
         httpd.serve_forever()